@@ -7,12 +7,54 @@ analyze.py - print mean temperature anomaly
 
 import csv
 import os.path
+import sys
+from array import array
+from collections.abc import Sequence
+from operator import itemgetter
 
 YEAR_INDEX = "Year"
 ANN_MEAN_INDEX = "J-D"
 
+# File locations, resolved once at import.
+_ROOT = os.path.dirname(__file__)
+_CLEAN_CSV = os.path.join(_ROOT, "data/clean_data.csv")
+
+def _periodic_means(
+    years: Sequence[int], 
+    anomalies: Sequence[float], 
+    period: int, 
+    include_last: bool
+) -> list[tuple[int, int, float]]:
+    """
+    Return ``(start year, end year, mean anomaly)`` for each period.
+
+    Parameters
+    ----------
+    years: sequence of int, year of each entry
+    anomalies: sequence of float, temperature anomaly of each entry
+    period: int, number of entries averaged together
+    include_last: bool, whether the trailing entries that do not fill a 
+        whole period are averaged as well
+    """
+    means: list[tuple[int, int, float]] = []
+
+    n_full = len(anomalies) // period * period
+    for i in range(0, n_full, period):
+        means.append((years[i], years[i + period - 1], 
+                      sum(anomalies[i:i + period]) / period))
+
+    # Process unreported value.
+    if n_full < len(anomalies) and include_last:
+        means.append((years[n_full], years[-1], 
+                      sum(anomalies[n_full:]) / (len(anomalies) - n_full)))
+    
+    return means
+
+
 def _display_periodic_avg(
     reader, 
+    year_idx: int, 
+    ann_idx: int, 
     *, 
     period: int = 10, 
     print_last: bool = True
@@ -22,7 +64,10 @@ def _display_periodic_avg(
 
     Parameters
     ----------
-    reader: CSV reader that contains the temperature anomaly file
+    reader: CSV reader that contains the temperature anomaly file, 
+        positioned after the header row
+    year_idx: int, column index of the year
+    ann_idx: int, column index of the annual mean anomaly
     period: int, the period the mean is calculated, default 10
     print_last: bool, whether the mean of the last interval should
         be printed if it is less than the period
@@ -31,46 +76,37 @@ def _display_periodic_avg(
     ------
     ValueError : iterator of the ``reader`` is empty.
     """
-    # Stores the first year and last year of an interval.
-    year_range: dict[str:int] = dict()
-    anomaly_sum = 0
-    
-    for row in reader:
-        this_year = int(row[YEAR_INDEX])
-        curr_anomaly = float(row[ANN_MEAN_INDEX])
-
-        # Begin a new decade.
-        if not year_range:
-            year_range["start"] = this_year
+    # Load both columns once, then reduce each period with a slice sum.
+    years: list[int] = []
+    anomalies: array = array("d")
 
-        anomaly_sum += curr_anomaly
-        year_range["end"] = this_year
-
-        if this_year - year_range['start'] + 1 == period:
-            print(f"{year_range['start']} to {year_range['end']}: the average "
-                  + f"temperature anomaly is {anomaly_sum / period} degrees.")
-            
-            anomaly_sum = 0
-            year_range.clear()
+    # Bind builtins and methods to locals for the per-row loop.
+    _int, _float = int, float
+    add_year, add_anomaly = years.append, anomalies.append
+    get_fields = itemgetter(year_idx, ann_idx)
+    for row in reader:
+        year, anomaly = get_fields(row)
+        add_year(_int(year))
+        add_anomaly(_float(anomaly))
 
-    # Process unreported value.
-    if year_range and print_last:
-        avg = anomaly_sum / (year_range['end'] - year_range['start'] + 1)
-        print(f"{year_range['start']} to {year_range['end']}: "
-              + f"the average temperature anomaly is {avg} degrees.")
+    # Build every line first and write them to stdout in one call.
+    sys.stdout.write("".join(
+        f"{start_year} to {end_year}: the average "
+        f"temperature anomaly is {avg} degrees.\n"
+        for start_year, end_year, avg in _periodic_means(years, anomalies, 
+                                                         period, print_last)
+    ))
     
     return None
 
 
 def main():
-    # Setup file directory.
-    root = os.path.dirname(__file__)
-    data_path = os.path.join(root, "data/clean_data.csv")
-
     # Read data and output average.
-    with open(data_path, "r") as data:
-        reader = csv.DictReader(data, delimiter=",")
-        _display_periodic_avg(reader)
+    with open(_CLEAN_CSV, "r") as data:
+        reader = csv.reader(data, delimiter=",")
+        header = next(reader)
+        _display_periodic_avg(reader, header.index(YEAR_INDEX), 
+                              header.index(ANN_MEAN_INDEX))
             
 
 if __name__ == "__main__":
@@ -5,11 +5,22 @@
 munge.py - clean up fwf/write CSV files
 """
 
-import re
 import os.path
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
 
-NO_RESTRICTION = 0
+NO_RESTRICTION = -1
 TO_FARENHEIT_COEFFICIENT = 1.8
+# Read buffer for source files, large enough to hold typical fwf tables.
+READ_BUFFER_SIZE = 1 << 20
+# Field widths of the GISS temperature table, from 'Year' to 'SON'.
+GISS_COL_WIDTHS = (4, 6, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5, 5, 7, 4, 7, 5, 5, 5)
+
+# File locations, resolved once at import.
+_ROOT = os.path.dirname(__file__)
+_RAW_FWF = os.path.join(_ROOT, "data/ocean_temp_data.fwf")
+_CLEAN_CSV = os.path.join(_ROOT, "data/clean_data.csv")
 
 
 def write_csv(
@@ -37,6 +48,39 @@ def write_csv(
         Boolean, overwrite the destination file if true. Otherwise, 
         raise ``FileExistsError``.
 
+    Raises
+    ------
+    FileExistsError : if the file specified ``destination`` already exists and
+        ``overwrite`` is ``False``.
+    """
+    write_csv_stream(destination, data, encoding=encoding, overwrite=overwrite)
+
+
+def write_csv_stream(
+    destination: str, 
+    rows: Iterable[list[str]], 
+    *, 
+    encoding: str = "utf-8", 
+    overwrite: bool = False
+) -> None: 
+    """
+    Write rows to given directory as CSV file as they are produced, without 
+    holding all of them in memory.
+
+    Parameters
+    ----------
+    destination : str, path to where data to be saved, a URL
+        String, the rows will be written to desired. Create a file if it 
+        does not exist. 
+    rows : iterable of list of str
+        An iterable (e.g. a generator) of string lists with each of them 
+        representing a row of the CSV file (the first row is the header).
+    encoding : str, default utf-8
+        String, the encoding the data should use.
+    overwrite : bool, default ``False``.
+        Boolean, overwrite the destination file if true. Otherwise, 
+        raise ``FileExistsError``.
+
     Raises
     ------
     FileExistsError : if the file specified ``destination`` already exists and
@@ -47,13 +91,13 @@ def write_csv(
         raise FileExistsError(f"{destination} already exists")
     
     # Write to destination.
-    with open(destination, "w", encoding=encoding) as file:
-        for row in data:
-            file.write(",".join(row) + "\n")
+    with open(destination, "w", encoding=encoding, newline="") as file:
+        file.writelines(",".join(row) + "\n" for row in rows)
+
 
-def _is_postive_integer(x: int) -> bool:
+def _is_positive_integer(x: int) -> bool:
     """Return if input is positive integer."""
-    return type(x) == int and x > 0
+    return type(x) is int and x > 0
 
 
 def parse_fixed_width_data(
@@ -62,9 +106,11 @@ def parse_fixed_width_data(
     start: int, 
     end: int, 
     col_len: int | None = None, 
+    col_widths: Iterable[int] | None = None, 
     encoding: str = "utf-8", 
     destination: str = "", 
-    overwrite: bool = False
+    overwrite: bool = False, 
+    parallel: bool = False
 ) -> (list[list[str]] | None):
     """
     Parse a fixed-width file at a given directory.
@@ -81,6 +127,11 @@ def parse_fixed_width_data(
     col_len: int, number of columns, optional
         Number of columns in the desired data. Discard extra column if 
         original data has more.
+    col_widths: iterable of int, width of each column, optional
+        Character widths of the columns, from left to right. If given, 
+        fields are cut at these offsets instead of split on whitespace, 
+        and lines that do not reach the last column or have an empty first 
+        field (e.g. blank lines and notes) are discarded.
     encoding : str, default utf-8
         String, the encoding the file used.
     destination : str, path to where data to be saved, a URL, default ``""``
@@ -89,6 +140,9 @@ def parse_fixed_width_data(
     overwrite : bool, default ``False``.
         Boolean, overwrite the destination file if true. Otherwise, 
         raise ``FileExistsError``.
+    parallel : bool, default ``False``.
+        Boolean, parse the lines in chunks across worker processes if true. 
+        Only pays off for large files; rows are returned in file order.
     
     Returns
     -------
@@ -106,110 +160,215 @@ def parse_fixed_width_data(
         ``overwrite`` is ``False``.
     """
     # Check input 'start' and 'end'.
-    if not _is_postive_integer(start):
+    if not _is_positive_integer(start):
         raise ValueError(f"'start' ({start}) must be a positive integer")
-    if not _is_postive_integer(end):
+    if not _is_positive_integer(end):
         raise ValueError(f"'end' ({end}) must be a positive integer")
     if start > end:
         raise ValueError(f"'start' ({start}) must be less than or \
                          equal to 'end' ({end})")
     # Check 'col_len'.
     if col_len is not None \
-    and not _is_postive_integer(col_len) \
+    and not _is_positive_integer(col_len) \
     and col_len != 0:
         raise ValueError(f"'col_len' ({col_len}) must be an integer at least 0")
+    # Check 'col_widths'.
+    if col_widths is not None:
+        col_widths = tuple(col_widths)
+        if not col_widths \
+        or not all(_is_positive_integer(width) for width in col_widths):
+            raise ValueError(f"'col_widths' ({col_widths}) must be "
+                             "positive integers")
+
+    with open(path, "r", encoding=encoding, 
+              buffering=READ_BUFFER_SIZE) as data_file:
+        if parallel:
+            rows = _parse_fwf_parallel(data_file, start=start, end=end, 
+                                       col_len=col_len, col_widths=col_widths)
+        else:
+            rows = _iter_fwf_rows(data_file, start=start, end=end, 
+                                  col_len=col_len, col_widths=col_widths)
+        if not destination:
+            return list(rows)
+
+        write_csv_stream(destination, rows, 
+                         encoding=encoding, overwrite=overwrite)
+    return None
 
+
+def _iter_fwf_rows(
+    lines: Iterable[str], 
+    *, 
+    start: int, 
+    end: int, 
+    col_len: int | None = None, 
+    col_widths: Iterable[int] | None = None, 
+    header: list[str] | None = None
+) -> Iterator[list[str]]:
+    """
+    Yield the rows of a fixed-width file one at a time.
+
+    Parameters
+    ----------
+    lines: iterable of str, lines of the fixed-width file (e.g. an open file)
+    start: int, line number of the header of the actual data
+    end: int, line number of the last line of the actual data
+    col_len: int, number of columns, optional
+    col_widths: iterable of int, width of each column, optional. If given, 
+        fields are sliced at these offsets rather than split on whitespace
+    header: list of str, header already parsed, optional. If given, the 
+        line at ``start`` is treated as data
+
+    Unless ``header`` is given, the first row yielded is the header. 
+    Repeated headers (rows starting with the first header field) are 
+    skipped, as are rows whose number of columns differ from the header 
+    or, with ``col_widths``, lines that do not reach the last column or 
+    leave the first column empty.
+    """
     # Setup split limit for extracting data.
     maxsplit: int = col_len if col_len else NO_RESTRICTION
 
-    with open(path, "r", encoding=encoding) as data_file:
-        # Skip lines before start.
-        for _ in range(start - 1):
-            data_file.readline()
-        
-        # Create data container.
-        data: list[list[str]] = []
-
-        # Parse data between start and end lines, inclusive.
-        header: list[str] | None = None
-        for row_number in range(start, end + 1):
-            source_row = re.split("[\s]+", data_file.readline(), 
-                           maxsplit=maxsplit)
-            data_row: list[str] = source_row[:min(len(source_row), maxsplit)]
-            
+    # Setup (begin, end) character offsets of each field.
+    bounds: list[tuple[int, int]] = []
+    if col_widths:
+        offset = 0
+        for width in list(col_widths)[:col_len] if col_len else col_widths:
+            bounds.append((offset, offset + width))
+            offset += width
+
+    # Parse data between start and end lines, inclusive.
+    for row_number, line in enumerate(islice(lines, start - 1, end), 
+                                      start=start):
+        if bounds:
+            # Skip lines too short to reach the last field (e.g. notes).
+            if len(line.rstrip("\n")) <= bounds[-1][0]:
+                continue
+            data_row: list[str] = [line[a:b].strip() for a, b in bounds]
+            # Skip lines that leave the first field empty.
+            if not data_row[0]:
+                continue
+        else:
+            source_row = line.split(None, maxsplit)
+            data_row: list[str] = source_row[:col_len] if col_len \
+                                  else source_row
             # Check if 'data_row' inconsisitent with CSV format.
             if header and len(data_row) != len(header):
                 continue
-            # Check if 'data_row' is header.
-            if data_row == header:
-                continue
-            
-            if row_number == start:
-                header = data_row
-            data.append(data_row)
-    
-    if not destination:
-        return data
+        
+        # Check if 'data_row' is a repeated header by its first field.
+        if header and data_row and data_row[0] == header[0]:
+            continue
+        
+        if row_number == start and header is None:
+            header = data_row
+        yield data_row
 
-    write_csv(destination, data, encoding=encoding, overwrite=overwrite)
-    return None
+
+def _parse_fwf_chunk(
+    chunk: list[str], 
+    header: list[str], 
+    col_len: int | None, 
+    col_widths: Iterable[int] | None
+) -> list[list[str]]:
+    """Parse a chunk of data lines that follow an already parsed header."""
+    return list(_iter_fwf_rows(chunk, start=1, end=len(chunk), col_len=col_len,
+                               col_widths=col_widths, header=header))
+
+
+def _parse_fwf_parallel(
+    lines: Iterable[str], 
+    *, 
+    start: int, 
+    end: int, 
+    col_len: int | None = None, 
+    col_widths: Iterable[int] | None = None
+) -> list[list[str]]:
+    """
+    Parse the rows of a fixed-width file with a pool of worker processes.
+
+    Same parameters and result as ``_iter_fwf_rows``. The header line is 
+    parsed first, then the remaining lines are split into one contiguous 
+    chunk per worker and parsed by ``_parse_fwf_chunk``. If the line at 
+    ``start`` yields no header, the lines are parsed serially instead.
+    """
+    lines = list(islice(lines, start - 1, end))
+    rows = list(_iter_fwf_rows(lines[:1], start=1, end=1, 
+                               col_len=col_len, col_widths=col_widths))
+    if len(lines) <= 1:
+        return rows
+    # Without a header line nothing is filtered against it; parse serially.
+    if not rows:
+        return list(_iter_fwf_rows(lines, start=1, end=len(lines), 
+                                   col_len=col_len, col_widths=col_widths))
+
+    # Split the data lines into contiguous chunks, one per worker.
+    body = lines[1:]
+    workers = min(os.cpu_count() or 1, len(body))
+    size = -(-len(body) // workers)
+    chunks = [body[i:i + size] for i in range(0, len(body), size)]
+
+    # 'map' keeps the chunks in order.
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for part in executor.map(_parse_fwf_chunk, chunks, repeat(rows[0]), 
+                                 repeat(col_len), repeat(col_widths)):
+            rows.extend(part)
+    
+    return rows
 
 
 def _to_farenheit(
     data: list[list[str]], 
     *, 
     start: (int, int) = (0, 0), 
-    end: [any, any] = [None, None]
+    end: (int | None, int | None) = (None, None)
 ) -> None:
     """
     Convert a rectangle range of entries of a m * n list to 
-    Farenheit temperature.
+    Farenheit temperature. Entries that are not numbers (e.g. missing 
+    values) are left unchanged.
     
     Parameters
     ----------
     data: 2d list of str, the data that contain the entries to be converted
     start: tuple of int, row and column indices of the upleft entry of 
         the region to be converted
-    end: tuple of int, row and column indices of the right down entry of 
-        the last entry of the region
+    end: tuple of int, row and column indices one past the right down entry 
+        of the region, default to the number of rows and columns of ``data``
     """
     if len(data) == 0 or len(data[0]) == 0:
         return None
     
-    end[0] = end[0] if end[0] else len(data)
-    end[1] = end[1] if end[1] else len(data[0][0])
+    end_row = end[0] if end[0] else len(data)
+    end_col = end[1] if end[1] else len(data[0])
 
-    for row_index in range(start[0], end[1]):
-        for col_index in range(start[1], end[1]):
-            entry = data[row_index][col_index]
-            if not entry.isnumeric:
+    for row_index in range(start[0], end_row):
+        row = data[row_index]
+        for col_index in range(start[1], end_col):
+            try:
+                val = float(row[col_index]) * TO_FARENHEIT_COEFFICIENT
+            except ValueError:
                 continue
-            val = float(entry) * TO_FARENHEIT_COEFFICIENT
-            data[row_index][col_index] = f"%.1f" % val
+            row[col_index] = f"{val:.1f}"
     
     return None
 
 
 def main():
-    # Set file directory.
-    root = os.path.dirname(__file__)
-    data_path = os.path.join(root, "data/ocean_temp_data.fwf")
-    target_path = os.path.join(root, "data/clean_data.csv")
-
     # Parse and convert data.
-    data: list[list[str]] = parse_fixed_width_data(data_path, 
-                           start=8, end=166, col_len=19)
+    data: list[list[str]] = parse_fixed_width_data(_RAW_FWF, 
+                           start=8, end=166, 
+                           col_widths=GISS_COL_WIDTHS)
     _to_farenheit(data, start=(1, 1))
     
     # Fix missing value.
-    djf_10 = sum([float(data[c][-4]) for c in range(2, 12)])
-    data[1][-4] = f"%.1f" % (djf_10 % 10) # DJF 1880
+    djf_10 = sum(float(data[c][-4]) for c in range(2, 12))
+    data[1][-4] = f"{djf_10 / 10:.1f}" # DJF 1880
 
-    d_n_sum = sum([float(data[1][r]) for r in range(-4, 0, 1)])
-    data[1][-5] = f"%.1f" % (d_n_sum % 4) # D-N 1880
+    d_n_sum = sum(float(data[1][r]) for r in range(-4, 0, 1))
+    data[1][-5] = f"{d_n_sum / 4:.1f}" # D-N 1880
 
     # Save data.
-    write_csv(target_path, data, encoding="utf-8", overwrite=True)
+    write_csv(_CLEAN_CSV, data, encoding="utf-8", overwrite=True)
     
 
 if __name__ == "__main__":